@@ -1,6 +1,15 @@
 import time
+import orjson
 import requests
-from config import GITHUB_GRAPHQL_URL, API_TOKEN, REPOS_POR_PAGINA, ESPERA_ENTRE_PAGINAS_SEG
+from requests.adapters import HTTPAdapter
+from config import (
+    GITHUB_GRAPHQL_URL, API_TOKEN, REPOS_POR_PAGINA, ESPERA_ENTRE_PAGINAS_SEG,
+    RATE_LIMIT_FOLGA, RATE_LIMIT_CRITICO
+)
+
+# Sessão única: keep-alive reaproveita a conexão TCP/TLS entre as páginas.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
 
 def montar_query() -> str:
     """Retorna a query GraphQL com todos os campos necessários para as RQs."""
@@ -12,7 +21,6 @@ def montar_query() -> str:
           node {
             ... on Repository {
               nameWithOwner 
-              url 
               createdAt 
               updatedAt
               primaryLanguage { name }
@@ -20,8 +28,7 @@ def montar_query() -> str:
               closedIssues: issues(states: CLOSED) { totalCount }
               pullRequests(states: MERGED) { totalCount }
               releases { totalCount }
-              stargazerCount 
-              forkCount
+              stargazerCount
             }
           }
         }
@@ -29,22 +36,61 @@ def montar_query() -> str:
     }
     """
 
+def eh_rate_limit(response: requests.Response) -> bool:
+    """429, ou 403 por cota esgotada / secondary rate limit."""
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        return True
+    texto = response.text.lower()
+    return "secondary rate limit" in texto or "abuse" in texto
+
+def espera_sugerida(response: requests.Response) -> float | None:
+    """Espera indicada pelo GitHub nos headers, ou None se ele não disser nada."""
+    reset = response.headers.get("X-RateLimit-Reset", "")
+    if response.headers.get("X-RateLimit-Remaining") == "0" and reset.isdigit():
+        return max(0.0, int(reset) - time.time()) + 1
+
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return float(retry_after)
+
+    return None
+
+def espera_entre_paginas(response: requests.Response) -> float:
+    """Pausa até a próxima página conforme a cota restante (X-RateLimit-Remaining)."""
+    restante = response.headers.get("X-RateLimit-Remaining", "")
+    reset = response.headers.get("X-RateLimit-Reset", "")
+    if not restante.isdigit():
+        return ESPERA_ENTRE_PAGINAS_SEG
+
+    restante = int(restante)
+    if restante > RATE_LIMIT_FOLGA:
+        return 0.0
+    if restante < RATE_LIMIT_CRITICO and reset.isdigit():
+        return max(0.0, int(reset) - time.time()) / max(restante, 1)
+    return ESPERA_ENTRE_PAGINAS_SEG
+
 def buscar_repositorios(total: int) -> list[dict]:
     if not API_TOKEN:
         raise RuntimeError("API_TOKEN não encontrado. Verifique seu arquivo .env")
 
-    headers = {
+    SESSION.headers.update({
         "Authorization": f"Bearer {API_TOKEN}",
         "Content-Type": "application/json"
-    }
+    })
     query = montar_query()
     repositorios = []
     cursor = None
     tentativas_erro = 0
     max_tentativas = 5
+    por_pagina = REPOS_POR_PAGINA
+    gateway_seguidos = 0
 
     while len(repositorios) < total:
-        quantidade = min(REPOS_POR_PAGINA, total - len(repositorios))
+        quantidade = min(por_pagina, total - len(repositorios))
         variables = {
             "queryString": "stars:>0 sort:stars-desc",
             "first": quantidade,
@@ -52,28 +98,42 @@ def buscar_repositorios(total: int) -> list[dict]:
         }
 
         try:
-            response = requests.post(
+            response = SESSION.post(
                 GITHUB_GRAPHQL_URL, 
                 json={"query": query, "variables": variables}, 
-                headers=headers, 
                 timeout=30
             )
 
             # Tratamento de Erros de Rede/API
             if response.status_code != 200:
                 tentativas_erro += 1
-                espera = tentativas_erro * 10 # Espera 10s, 20s, 30s...
-                print(f"\n[!] Erro {response.status_code}. Tentativa {tentativas_erro}/{max_tentativas}. "
-                      f"Aguardando {espera}s...")
+                limitado = eh_rate_limit(response)
+                espera = espera_sugerida(response)
+                if espera is None:
+                    # Sem header, o GitHub pede ao menos 1 min para o secondary rate limit.
+                    espera = 60 if limitado else tentativas_erro * 10 # Espera 10s, 20s, 30s...
+                motivo = "Rate limit" if limitado else "Erro"
+                print(f"\n[!] {motivo} {response.status_code}. Tentativa {tentativas_erro}/{max_tentativas}. "
+                      f"Aguardando {espera:.0f}s...")
                 
                 if tentativas_erro >= max_tentativas:
                     print("Critico: Limite de tentativas atingido. Salvando o que foi coletado até agora.")
                     break
+
+                # Páginas grandes são as que mais sofrem 502: se repetir, tenta com metade.
+                if response.status_code in (502, 503, 504):
+                    gateway_seguidos += 1
+                    if gateway_seguidos >= 2 and por_pagina > 1:
+                        por_pagina = max(1, por_pagina // 2)
+                        gateway_seguidos = 0
+                        print(f"    Reduzindo página para {por_pagina} repos.")
+                else:
+                    gateway_seguidos = 0
                 
                 time.sleep(espera)
                 continue
 
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # Verifica se há erros retornados pelo GraphQL (ex: query malformada)
             if "errors" in data:
@@ -95,9 +155,10 @@ def buscar_repositorios(total: int) -> list[dict]:
             
             cursor = page_info.get("endCursor")
             tentativas_erro = 0 # Reseta erros se a página foi baixada com sucesso
+            gateway_seguidos = 0
             
             print(f"-> Coletados: {len(repositorios)}/{total}...", end="\r")
-            time.sleep(ESPERA_ENTRE_PAGINAS_SEG)
+            time.sleep(espera_entre_paginas(response))
 
         except requests.exceptions.RequestException as e:
             print(f"\n[Falha de Conexão]: {e}. Tentando novamente em 10s...")
@@ -8,8 +8,10 @@ GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
 API_TOKEN = os.getenv("API_TOKEN")
 
 # Parâmetros de Performance e Coleta
-REPOS_POR_PAGINA = 10 # Menor valor = mais estabilidade contra erro 502
+REPOS_POR_PAGINA = int(os.getenv("REPOS_POR_PAGINA", "100")) # Reduzido pela metade em erro 502
 ESPERA_ENTRE_PAGINAS_SEG = 0.02
+RATE_LIMIT_FOLGA = 1000 # Acima disso não há pausa entre páginas
+RATE_LIMIT_CRITICO = 200 # Abaixo disso as páginas são espalhadas até o reset
 TOTAL_REPOS_PESQUISA = 1000  # Centraliza o limite exigido pelo trabalho
 
 # Nomes de Arquivos de Saída
@@ -6,6 +6,27 @@ from coletor import buscar_repositorios
 # from analise import analisar_resultados
 from visualizacao import analisar_visualizacao
 
+# Cabeçalho do CSV com as métricas de todas as RQs
+COLUNAS_CSV = (
+    "nameWithOwner", "repo_age_days", "primaryLanguage",
+    "merged_pull_requests", "releases_total", "stargazers",
+    "last_update_days", "closed_issues_ratio"
+)
+
+VAZIO: dict = {}
+
+def dias_desde(iso: str, agora: datetime) -> int:
+    # createdAt/updatedAt: índices fixos; fromisoformat só se o formato mudar.
+    try:
+        dt = datetime(
+            int(iso[0:4]), int(iso[5:7]), int(iso[8:10]),
+            int(iso[11:13]), int(iso[14:16]), int(iso[17:19]),
+            tzinfo=timezone.utc,
+        )
+    except ValueError:
+        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    return (agora - dt).days
+
 def salvar_csv(repositorios: list[dict]):
     """
     Processa os dados coletados e calcula as métricas para todas as RQs:
@@ -17,28 +38,17 @@ def salvar_csv(repositorios: list[dict]):
     RQ 06: Razão de Issues Fechadas
     """
     agora = datetime.now(timezone.utc)
-    
-    # Cabeçalho atualizado com as novas métricas
-    colunas = [
-        "nameWithOwner", "repo_age_days", "primaryLanguage",
-        "merged_pull_requests", "releases_total", "stargazers",
-        "last_update_days", "closed_issues_ratio"
-    ]
 
     print(f"Salvando dados em {ARQUIVO_CSV}...")
 
-    with open(ARQUIVO_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=colunas)
-        writer.writeheader()
-        
+    def linhas():
         for repo in repositorios:
             # --- RQ 01: Idade ---
             created_at = repo.get("createdAt", "")
             age_days = ""
             if created_at:
                 try:
-                    dt_cr = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                    age_days = (agora - dt_cr).days
+                    age_days = dias_desde(created_at, agora)
                 except: pass
 
             # --- RQ 04: Tempo até última atualização ---
@@ -46,13 +56,12 @@ def salvar_csv(repositorios: list[dict]):
             last_update_days = ""
             if updated_at:
                 try:
-                    dt_up = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
-                    last_update_days = (agora - dt_up).days
+                    last_update_days = dias_desde(updated_at, agora)
                 except: pass
 
             # --- RQ 06: Razão de Issues Fechadas ---
-            issues_info = repo.get("issues") or {}
-            closed_info = repo.get("closedIssues") or {}
+            issues_info = repo.get("issues") or VAZIO
+            closed_info = repo.get("closedIssues") or VAZIO
             
             total_issues = issues_info.get("totalCount", 0)
             closed_issues = closed_info.get("totalCount", 0)
@@ -62,16 +71,26 @@ def salvar_csv(repositorios: list[dict]):
             if total_issues > 0:
                 ratio = closed_issues / total_issues
 
-            writer.writerow({
-                "nameWithOwner": repo.get("nameWithOwner"),
-                "repo_age_days": age_days,
-                "primaryLanguage": (repo.get("primaryLanguage") or {}).get("name") or "None",
-                "merged_pull_requests": (repo.get("pullRequests") or {}).get("totalCount", 0),
-                "releases_total": (repo.get("releases") or {}).get("totalCount", 0),
-                "stargazers": repo.get("stargazerCount", 0),
-                "last_update_days": last_update_days,
-                "closed_issues_ratio": round(ratio, 4) # Arredondado para 4 casas
-            })
+            lang = (repo.get("primaryLanguage") or VAZIO).get("name")
+            pull_requests = repo.get("pullRequests") or VAZIO
+            releases = repo.get("releases") or VAZIO
+
+            # Mesma ordem de COLUNAS_CSV.
+            yield (
+                repo.get("nameWithOwner"),
+                age_days,
+                lang or "None",
+                pull_requests.get("totalCount", 0),
+                releases.get("totalCount", 0),
+                repo.get("stargazerCount", 0),
+                last_update_days,
+                round(ratio, 4) # Arredondado para 4 casas
+            )
+
+    with open(ARQUIVO_CSV, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUNAS_CSV)
+        writer.writerows(linhas())
 
 def exibir_menu():
     print("\n" + "="*40)
@@ -1,19 +1,20 @@
 import os
-import requests
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
 token = os.getenv("API_TOKEN")
 
 url = "https://api.github.com/graphql"
-headers = {
+client = httpx.Client(http2=True, timeout=30.0)
+client.headers.update({
     "Authorization": f"Bearer {token}",
     "Accept": "application/vnd.github+json",
     "User-Agent": "LabExpSoftware/1.0 (Windows)"
-}
+})
 
 query = "query { viewer { login } }"
 
-r = requests.post(url, json={"query": query}, headers=headers, timeout=30)
+r = client.post(url, json={"query": query})
 print("Status:", r.status_code)
 print(r.text[:800])
\ No newline at end of file
@@ -1,21 +1,101 @@
+import base64
 import os
 import csv
+import threading
 import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
-import requests
+import httpx
+import orjson
 from dotenv import load_dotenv
 
+load_dotenv()
+
 GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
 
 # Configuração do experimento (Lab02S01 / Lab02S02)
 TOTAL_REPOS = 1000
-REPOS_POR_PAGINA = 10  # menor = mais estável contra 502
+# 100 é o máximo do search; em 502 persistente a coleta reduz a página pela metade.
+REPOS_POR_PAGINA = int(os.getenv("REPOS_POR_PAGINA", "100"))
 ESPERA_ENTRE_PAGINAS_SEG = 0.02
+RATE_LIMIT_FOLGA = 1000  # acima disso não há pausa entre páginas
+RATE_LIMIT_CRITICO = 200  # abaixo disso as páginas são espalhadas até o reset
+QUERY_STRING = "language:Java stars:>0 sort:stars-desc"
+WORKERS_PARALELOS = 5  # conservador por causa do secondary rate limit do GitHub
+
+VAZIO: dict = {}
 
 OUTPUT_CSV = "repos_java_1000.csv"
 OUTPUT_JSON = "repos_java_1000.json"
 
+COLUNAS_CSV = (
+    "nameWithOwner",
+    "url",
+    "createdAt",
+    "updatedAt",
+    "stars",
+    "releases_total",
+    "repo_age_years",
+    "primaryLanguage",
+)
+
+# Cliente único com HTTP/2: as requisições paralelas compartilham a mesma conexão TLS.
+CLIENT = httpx.Client(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=WORKERS_PARALELOS),
+)
+
+
+class GatewayInstavelError(RuntimeError):
+    """502/503/504 ou timeout persistentes mesmo após as novas tentativas (páginas menores podem passar)."""
+
+
+class RateLimitError(RuntimeError):
+    """Rate limit (429/403) persistente: reduzir a página só geraria mais requisições."""
+
+
+@dataclass
+class OrcamentoRateLimit:
+    # Compartilhado entre os workers: o lock serializa os horários de disparo,
+    # então a espera vale para o total de requisições, não para cada thread.
+    restante: int | None = None
+    reset_epoch: int | None = None
+    proximo_disparo: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def atualizar(self, resp: httpx.Response) -> None:
+        restante = resp.headers.get("X-RateLimit-Remaining")
+        reset = resp.headers.get("X-RateLimit-Reset")
+        with self.lock:
+            if reset and reset.isdigit() and int(reset) != self.reset_epoch:
+                # Nova janela de rate limit: o restante anterior não vale mais.
+                self.reset_epoch = int(reset)
+                self.restante = None
+            if restante and restante.isdigit():
+                # Respostas paralelas chegam fora de ordem; fica o menor restante da janela.
+                valor = int(restante)
+                self.restante = valor if self.restante is None else min(self.restante, valor)
+
+    def aguardar_vez(self) -> None:
+        with self.lock:
+            agora = time.monotonic()
+            disparo = max(agora, self.proximo_disparo)
+            self.proximo_disparo = disparo + self.espera()
+        time.sleep(disparo - agora)
+
+    def espera(self) -> float:
+        if self.restante is None:
+            return ESPERA_ENTRE_PAGINAS_SEG
+        if self.restante > RATE_LIMIT_FOLGA:
+            return 0.0
+        if self.restante < RATE_LIMIT_CRITICO and self.reset_epoch:
+            return max(0.0, self.reset_epoch - time.time()) / max(self.restante, 1)
+        return ESPERA_ENTRE_PAGINAS_SEG
+
 
 def carregar_token() -> str:
     load_dotenv()
@@ -31,6 +111,7 @@ def montar_query() -> str:
     return """
     query($queryString: String!, $first: Int!, $after: String) {
       search(query: $queryString, type: REPOSITORY, first: $first, after: $after) {
+        repositoryCount
         pageInfo { hasNextPage endCursor }
         edges {
           node {
@@ -50,32 +131,58 @@ def montar_query() -> str:
     """
 
 
-def post_graphql_com_retry(headers: dict, payload: dict, max_tentativas: int = 6) -> requests.Response:
+def eh_rate_limit(resp: httpx.Response) -> bool:
+    # 429, ou 403 por cota primária esgotada / secondary rate limit ("abuse").
+    if resp.status_code == 429:
+        return True
+    if resp.status_code != 403:
+        return False
+    if resp.headers.get("X-RateLimit-Remaining") == "0":
+        return True
+    texto = resp.text.lower()
+    return "secondary rate limit" in texto or "abuse" in texto
+
+
+def espera_sugerida(resp: httpx.Response) -> float | None:
+    # Prefere o que o GitHub informa; None = usar o backoff exponencial.
+    reset = resp.headers.get("X-RateLimit-Reset")
+    if resp.headers.get("X-RateLimit-Remaining") == "0" and reset and reset.isdigit():
+        return max(0.0, int(reset) - time.time()) + 1
+
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+
+    return None
+
+
+def post_graphql_com_retry(payload: dict, max_tentativas: int = 6) -> httpx.Response:
     espera = 1
+    limitado = False
     for tentativa in range(1, max_tentativas + 1):
         try:
-            resp = requests.post(
-                GITHUB_GRAPHQL_URL,
-                json=payload,
-                headers=headers,
-                timeout=30,
-            )
+            resp = CLIENT.post(GITHUB_GRAPHQL_URL, json=payload)
 
             if resp.status_code == 200:
                 return resp
 
-            if resp.status_code in (502, 503, 504):
+            limitado = eh_rate_limit(resp)
+            if resp.status_code in (502, 503, 504) or limitado:
+                sugerida = espera_sugerida(resp)
+                aguardar = sugerida if sugerida is not None else espera
                 print(
                     f"  [WARN] HTTP {resp.status_code} (tentativa {tentativa}/{max_tentativas}). "
-                    f"Aguardando {espera}s..."
+                    f"Aguardando {aguardar:.0f}s..."
                 )
-                time.sleep(espera)
-                espera = min(espera * 2, 20)
+                time.sleep(aguardar)
+                if sugerida is None:
+                    espera = min(espera * 2, 20)
                 continue
 
             raise RuntimeError(f"Falha GraphQL ({resp.status_code}): {resp.text}")
 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
+            limitado = False
             print(
                 f"  [WARN] Timeout (tentativa {tentativa}/{max_tentativas}). "
                 f"Aguardando {espera}s..."
@@ -83,7 +190,77 @@ def post_graphql_com_retry(headers: dict, payload: dict, max_tentativas: int = 6
             time.sleep(espera)
             espera = min(espera * 2, 20)
 
-    raise RuntimeError("Falha após múltiplas tentativas (502/timeout). Tente novamente mais tarde.")
+    if limitado:
+        raise RateLimitError("Rate limit do GitHub persistente após múltiplas tentativas. Tente novamente mais tarde.")
+    raise GatewayInstavelError("Falha após múltiplas tentativas (502/timeout). Tente novamente mais tarde.")
+
+
+def executar_search(query: str, variables: dict, orcamento: OrcamentoRateLimit, max_tentativas: int = 6) -> dict:
+    response = post_graphql_com_retry({"query": query, "variables": variables}, max_tentativas=max_tentativas)
+    orcamento.atualizar(response)
+    data = orjson.loads(response.content)
+
+    if "errors" in data:
+        raise RuntimeError(f"Erro(s) GraphQL: {data['errors']}")
+
+    return data.get("data", {}).get("search", {})
+
+
+def cursor_na_posicao(posicao: int) -> str:
+    # O search do GitHub usa cursores de deslocamento: base64("cursor:<posição>").
+    return base64.b64encode(f"cursor:{posicao}".encode()).decode()
+
+
+def buscar_pagina(
+    query: str,
+    cursor: str | None,
+    quantidade: int,
+    orcamento: OrcamentoRateLimit,
+) -> tuple[list[dict], str | None, int | None]:
+    # Devolve (repos, endCursor, repositoryCount).
+    orcamento.aguardar_vez()
+    try:
+        # Páginas grandes tentam menos vezes antes de serem divididas.
+        search_info = executar_search(
+            query,
+            {"queryString": QUERY_STRING, "first": quantidade, "after": cursor},
+            orcamento,
+            max_tentativas=3 if quantidade > 1 else 6,
+        )
+    except GatewayInstavelError:
+        if quantidade == 1:
+            raise
+        metade = quantidade // 2
+        print(f"  [WARN] Instabilidade persistente. Dividindo página de {quantidade} em {metade} + {quantidade - metade}...")
+        inicio, cursor_meio, encontrados = buscar_pagina(query, cursor, metade, orcamento)
+        if not cursor_meio or len(inicio) < metade:
+            return inicio, cursor_meio, encontrados
+        fim, cursor_fim, encontrados = buscar_pagina(query, cursor_meio, quantidade - metade, orcamento)
+        return inicio + fim, cursor_fim, encontrados
+
+    nodes = [edge["node"] for edge in search_info.get("edges", []) if edge.get("node")]
+    return nodes, (search_info.get("pageInfo") or {}).get("endCursor"), search_info.get("repositoryCount")
+
+
+def buscar_sequencial(
+    query: str,
+    cursor: str,
+    restante: int,
+    por_pagina: int,
+    orcamento: OrcamentoRateLimit,
+) -> list[dict]:
+    repos: list[dict] = []
+
+    while len(repos) < restante:
+        quantidade = min(por_pagina, restante - len(repos))
+        nodes, cursor, _ = buscar_pagina(query, cursor, quantidade, orcamento)
+        repos.extend(nodes)
+        print(f"  Página: {len(repos)}/{restante}")
+
+        if len(nodes) < quantidade or not cursor:
+            break
+
+    return repos
 
 
 def buscar_repositorios_java(total: int = TOTAL_REPOS, por_pagina: int = REPOS_POR_PAGINA) -> list[dict]:
@@ -93,101 +270,100 @@ def buscar_repositorios_java(total: int = TOTAL_REPOS, por_pagina: int = REPOS_P
         raise ValueError("por_pagina deve estar entre 1 e 100.")
 
     token = carregar_token()
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-
-    query = montar_query()
-    repos: list[dict] = []
-    cursor: str | None = None
-
-    pagina = 0
-    while len(repos) < total:
-        pagina += 1
-        quantidade = min(por_pagina, total - len(repos))
-
-        variables = {
-            "queryString": "language:Java stars:>0 sort:stars-desc",
-            "first": quantidade,
-            "after": cursor,
+    CLIENT.headers.update(
+        {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept": "application/vnd.github+json",
         }
+    )
 
-        response = post_graphql_com_retry(headers, {"query": query, "variables": variables})
-        data = response.json()
-
-        if "errors" in data:
-            raise RuntimeError(f"Erro(s) GraphQL: {data['errors']}")
-
-        search_info = data.get("data", {}).get("search", {})
-        edges = search_info.get("edges", [])
-
-        for edge in edges:
-            node = edge.get("node")
-            if node:
-                repos.append(node)
-
-        page_info = search_info.get("pageInfo") or {}
-        has_next = page_info.get("hasNextPage")
-        cursor = page_info.get("endCursor")
+    orcamento = OrcamentoRateLimit()
+    query = montar_query()
 
-        print(f"  Página {pagina}: {len(repos)}/{total}")
+    # Primeira página serial: confirma o formato do cursor antes de abrir em paralelo.
+    primeira = min(por_pagina, total)
+    repos, cursor, encontrados = buscar_pagina(query, None, primeira, orcamento)
+    print(f"  Página 1: {len(repos)}/{total}")
 
-        if not has_next or not cursor or len(repos) >= total:
-            break
+    # Não agenda páginas além do que a busca tem.
+    if encontrados is not None:
+        total = min(total, encontrados)
 
-        time.sleep(ESPERA_ENTRE_PAGINAS_SEG)
+    if len(repos) < primeira or not cursor or len(repos) >= total:
+        return repos
 
-    return repos[:total]
+    if cursor != cursor_na_posicao(len(repos)):
+        print("  [WARN] Formato de cursor inesperado. Seguindo página a página...")
+        return repos + buscar_sequencial(query, cursor, total - len(repos), por_pagina, orcamento)
 
+    paginas = [
+        (cursor_na_posicao(inicio), min(por_pagina, total - inicio))
+        for inicio in range(len(repos), total, por_pagina)
+    ]
 
-def salvar_csv(repos: list[dict], caminho: str = OUTPUT_CSV) -> None:
+    with ThreadPoolExecutor(max_workers=WORKERS_PARALELOS) as executor:
+        futuros = [executor.submit(buscar_pagina, query, cursor, quantidade, orcamento) for cursor, quantidade in paginas]
+
+        # Consome na ordem de submissão para preservar a ordenação por estrelas.
+        for pagina, ((_, quantidade), futuro) in enumerate(zip(paginas, futuros), start=2):
+            nodes, _, _ = futuro.result()
+            repos.extend(nodes)
+            print(f"  Página {pagina}/{len(paginas) + 1}: {len(repos)}/{total}")
+
+            if len(nodes) < quantidade:
+                # Página curta: as seguintes deixariam buracos no ranking.
+                for pendente in futuros[pagina - 1:]:
+                    pendente.cancel()
+                break
+
+    return repos
+
+
+def dias_desde(iso: str, agora: datetime) -> int:
+    # A API sempre devolve YYYY-MM-DDTHH:MM:SSZ; fatiar é bem mais barato que strptime.
+    try:
+        dt = datetime(
+            int(iso[0:4]), int(iso[5:7]), int(iso[8:10]),
+            int(iso[11:13]), int(iso[14:16]), int(iso[17:19]),
+            tzinfo=timezone.utc,
+        )
+    except ValueError:
+        dt = datetime.strptime(iso, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return (agora - dt).days
+
+
+def linha_csv(repo: dict, agora: datetime) -> tuple:
+    # Formatador especializado para COLUNAS_CSV: código linear, sem laço sobre os nomes das colunas.
+    created_at = repo.get("createdAt")
+    lang = (repo.get("primaryLanguage") or VAZIO).get("name")
+    releases = repo.get("releases") or VAZIO
+
+    return (
+        repo.get("nameWithOwner"),
+        repo.get("url"),
+        created_at,
+        repo.get("updatedAt"),
+        repo.get("stargazerCount", 0),
+        releases.get("totalCount", 0),
+        dias_desde(created_at, agora) / 365.0 if created_at else "",
+        lang or "Java",
+    )
+
+
+def salvar_csv(repos: Iterable[dict], caminho: str = OUTPUT_CSV) -> None:
     agora = datetime.now(timezone.utc)
 
-    fieldnames = [
-        "nameWithOwner",
-        "url",
-        "createdAt",
-        "updatedAt",
-        "stars",
-        "releases_total",
-        "repo_age_years",
-        "primaryLanguage",
-    ]
-
-    with open(caminho, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for repo in repos:
-            created_at = repo.get("createdAt")
-            repo_age_years = ""
-
-            if created_at:
-                dt = datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
-                repo_age_years = (agora - dt).days / 365.0
-
-            lang = (repo.get("primaryLanguage") or {}).get("name")
-
-            writer.writerow(
-                {
-                    "nameWithOwner": repo.get("nameWithOwner"),
-                    "url": repo.get("url"),
-                    "createdAt": created_at,
-                    "updatedAt": repo.get("updatedAt"),
-                    "stars": repo.get("stargazerCount", 0),
-                    "releases_total": (repo.get("releases") or {}).get("totalCount", 0),
-                    "repo_age_years": repo_age_years,
-                    "primaryLanguage": lang or "Java",
-                }
-            )
+    with open(caminho, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUNAS_CSV)
+        writer.writerows(linha_csv(repo, agora) for repo in repos)
 
 
 def salvar_json(repos: list[dict], caminho: str = OUTPUT_JSON) -> None:
-    import json
-
-    with open(caminho, "w", encoding="utf-8") as f:
-        json.dump(repos, f, ensure_ascii=False, indent=2)
+    # orjson já gera UTF-8 (equivalente a ensure_ascii=False) e devolve bytes.
+    with open(caminho, "wb") as f:
+        f.write(orjson.dumps(repos, option=orjson.OPT_INDENT_2))
 
 
 def main() -> None:
@@ -9,7 +9,6 @@ API_TOKEN = os.getenv("API_TOKEN")
 
 # Coleta dos repositórios Java
 TOTAL_REPOS = 1000
-REPOS_POR_PAGINA = 10
 ESPERA_ENTRE_PAGINAS_SEG = 0.02
 QUERY_STRING = "language:Java stars:>0 sort:stars-desc"
 